@@ -1,6 +1,9 @@
+import multiprocessing
 import sys
 
 from imgconvert.app import main
 
 if __name__ == "__main__":
+    # 打包成 exe 后批量转换的进程池需要
+    multiprocessing.freeze_support()
     raise SystemExit(main(sys.argv))
@@ -1,9 +1,14 @@
 from __future__ import annotations
 
+import multiprocessing
+import os
 import sys
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from pathlib import Path
 
-from PySide6.QtCore import Qt
+from PySide6.QtCore import QObject, QRunnable, Qt, QThreadPool, QTimer, Signal
+from PySide6.QtGui import QGuiApplication
 from PySide6.QtWidgets import (
     QApplication,
     QComboBox,
@@ -18,17 +23,89 @@ from PySide6.QtWidgets import (
     QWidget,
 )
 
-from .converter import SUPPORTED_FORMATS, convert_file, detect_input_format
+from .converter import (
+    SUPPORTED_FORMATS,
+    ConvertResult,
+    _convert_file_fast,
+    convert_file,
+    detect_input_format,
+)
+
+
+BatchJob = tuple[Path, Path, str]
+
+# keeps the worker's QGuiApplication alive for the life of the process
+_worker_app: QGuiApplication | None = None
+
+
+def _init_batch_worker() -> None:
+    # SVG 中的文字渲染需要 QGuiApplication（QFontDatabase），每个子进程各建一个无界面的
+    global _worker_app
+    if QGuiApplication.instance() is None:
+        _worker_app = QGuiApplication(["imgconvert", "-platform", "offscreen"])
+
+
+def _make_batch_executor() -> Executor:
+    # 图片解码/编码是 CPU 密集型，优先用进程池；无法创建子进程时退回线程池。
+    # 统一用 spawn：fork 一个已有运行中线程的 QApplication 并不安全。
+    try:
+        # default max_workers follows the CPU count and is capped at 61 on Windows
+        return ProcessPoolExecutor(
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_batch_worker,
+        )
+    except (OSError, NotImplementedError, ImportError):
+        return ThreadPoolExecutor()
+
+
+class _ConvertSignals(QObject):
+    finished = Signal(object)
+
+
+class ConvertJob(QRunnable):
+    """Run convert_file on a QThreadPool worker and emit the ConvertResult."""
+
+    def __init__(
+        self, input_path: Path, output_path: Path, output_format: str, use_cache: bool = True
+    ) -> None:
+        super().__init__()
+        self.input_path = input_path
+        self.output_path = output_path
+        self.output_format = output_format
+        self.use_cache = use_cache
+        self.signals = _ConvertSignals()
+
+    def run(self) -> None:
+        try:
+            result = convert_file(
+                self.input_path, self.output_path, self.output_format, self.use_cache
+            )
+        except Exception as exc:
+            result = ConvertResult(False, f"转换异常：{exc}")
+        self.signals.finished.emit(result)
 
 
 class MainWindow(QMainWindow):
-    def __init__(self) -> None:
+    def __init__(self, use_cache: bool = True) -> None:
         super().__init__()
         self.setWindowTitle("ImgConvert")
 
+        self._use_cache = use_cache
+
         self._batch_inputs: list[Path] = []
         self._batch_mode = False
 
+        self._convert_job: ConvertJob | None = None
+        self._batch_executor: Executor | None = None
+        self._batch_pool_started = False
+        self._batch_pending: dict[Future, BatchJob] = {}
+        self._batch_total = 0
+        self._batch_success = 0
+        self._batch_failures: list[str] = []
+        self._batch_timer = QTimer(self)
+        self._batch_timer.setInterval(50)
+        self._batch_timer.timeout.connect(self._poll_batch)
+
         root = QWidget(self)
         self.setCentralWidget(root)
 
@@ -103,8 +180,9 @@ class MainWindow(QMainWindow):
             return
 
         # If user already chose an output path, don't override.
-        if self.output_edit.text().strip():
-            out_path = Path(self.output_edit.text().strip())
+        out_str = self.output_edit.text().strip()
+        if out_str:
+            out_path = Path(out_str)
             suggested = out_path.with_suffix("." + out_fmt)
             self.output_edit.setText(str(suggested))
             return
@@ -113,9 +191,9 @@ class MainWindow(QMainWindow):
         self.output_edit.setText(str(suggested))
 
     def _pick_output(self) -> None:
+        current = self.output_edit.text().strip() or self.input_edit.text().strip()
         if self._batch_mode:
-            base_dir = self.output_edit.text().strip() or self.input_edit.text().strip()
-            start_dir = str(Path(base_dir).parent) if base_dir else ""
+            start_dir = os.fspath(Path(current).parent) if current else ""
             path = QFileDialog.getExistingDirectory(self, "选择输出目录", start_dir)
             if not path:
                 return
@@ -124,9 +202,8 @@ class MainWindow(QMainWindow):
         out_fmt = self.format_combo.currentData() or "png"
         default_suffix = "." + out_fmt
 
-        default_path = self.output_edit.text().strip() or self.input_edit.text().strip()
-        if default_path:
-            base = str(Path(default_path))
+        if current:
+            base = os.fspath(Path(current))
         else:
             base = "output" + default_suffix
 
@@ -153,14 +230,27 @@ class MainWindow(QMainWindow):
             return
 
         if self._batch_mode and self._batch_inputs:
-            self._convert_batch(str(out_fmt))
+            self._convert_batch(str(out_fmt), out_str)
             return
 
         if not out_str:
             QMessageBox.warning(self, "提示", "请选择输出路径")
             return
 
-        result = convert_file(Path(in_str), Path(out_str), str(out_fmt))
+        if self._convert_job is not None:
+            return
+
+        job = ConvertJob(Path(in_str), Path(out_str), str(out_fmt), self._use_cache)
+        job.setAutoDelete(False)
+        job.signals.finished.connect(self._on_convert_done)
+        self._convert_job = job
+        self.btn_convert.setEnabled(False)
+        self.status.setText("转换中…")
+        QThreadPool.globalInstance().start(job)
+
+    def _on_convert_done(self, result: ConvertResult) -> None:
+        self._convert_job = None
+        self.btn_convert.setEnabled(True)
         self.status.setText(result.message)
         if not result.ok:
             QMessageBox.critical(self, "转换失败", result.message)
@@ -172,26 +262,96 @@ class MainWindow(QMainWindow):
             f"已生成：\n{result.output_path}",
         )
 
-    def _convert_batch(self, out_fmt: str) -> None:
-        total = len(self._batch_inputs)
-        success = 0
-        failures: list[str] = []
+    def _convert_batch(self, out_fmt: str, out_dir_text: str) -> None:
+        if self._batch_executor is not None:
+            return
 
-        out_dir_text = self.output_edit.text().strip()
+        # resolve and create the output directory once instead of per file;
+        # batch inputs are already resolved in set_startup_inputs
         if out_dir_text:
-            out_dir = Path(out_dir_text).expanduser()
+            out_dir = Path(out_dir_text).expanduser().resolve()
+            try:
+                out_dir.mkdir(parents=True, exist_ok=True)
+            except OSError as exc:
+                QMessageBox.critical(self, "批量转换失败", f"无法创建输出目录：{exc}")
+                return
         else:
             out_dir = None
 
+        jobs: list[BatchJob] = []
         for in_path in self._batch_inputs:
             target_dir = out_dir if out_dir is not None else in_path.parent
             out_path = (target_dir / in_path.stem).with_suffix("." + out_fmt)
-            result = convert_file(in_path, out_path, out_fmt)
+            jobs.append((in_path, out_path, out_fmt))
+
+        self._batch_total = len(jobs)
+        self._batch_success = 0
+        self._batch_failures = []
+        self._batch_pool_started = False
+        self._batch_executor = _make_batch_executor()
+        self._submit_batch(jobs)
+
+        self.btn_convert.setEnabled(False)
+        self.status.setText(f"批量转换中：0/{self._batch_total}")
+        self._batch_timer.start()
+
+    def _submit_batch(self, jobs: list[BatchJob]) -> None:
+        assert self._batch_executor is not None
+        for job in jobs:
+            future = self._batch_executor.submit(_convert_file_fast, *job, self._use_cache)
+            self._batch_pending[future] = job
+
+    def _poll_batch(self) -> None:
+        done = [f for f in self._batch_pending if f.done()]
+        broken: list[BatchJob] = []
+        for future in done:
+            job = self._batch_pending.pop(future)
+            in_path = job[0]
+            try:
+                result: ConvertResult = future.result()
+            except BrokenProcessPool:
+                broken.append(job)
+                continue
+            except Exception as exc:
+                result = ConvertResult(False, f"转换异常：{exc}")
+            else:
+                self._batch_pool_started = True
             if result.ok:
-                success += 1
+                self._batch_success += 1
+            else:
+                self._batch_failures.append(f"{in_path} -> {result.message}")
+
+        if broken:
+            broken.extend(self._batch_pending.values())
+            self._batch_pending.clear()
+            assert self._batch_executor is not None
+            self._batch_executor.shutdown(wait=False, cancel_futures=True)
+            if self._batch_pool_started:
+                # 运行中有子进程崩溃：进程池已不可用，剩余任务记为失败
+                self._batch_executor = None
+                for in_path, _, _ in broken:
+                    self._batch_failures.append(f"{in_path} -> 转换进程异常退出")
             else:
-                failures.append(f"{in_path} -> {result.message}")
+                # 子进程无法启动（如无法在子进程中加载 Qt）：全部改用线程池
+                self._batch_executor = ThreadPoolExecutor()
+                self._submit_batch(broken)
 
+        finished = self._batch_success + len(self._batch_failures)
+        self.status.setText(f"批量转换中：{finished}/{self._batch_total}")
+        if self._batch_pending:
+            return
+        self._finish_batch()
+
+    def _finish_batch(self) -> None:
+        self._batch_timer.stop()
+        if self._batch_executor is not None:
+            self._batch_executor.shutdown(wait=False)
+            self._batch_executor = None
+        self.btn_convert.setEnabled(True)
+
+        success = self._batch_success
+        total = self._batch_total
+        failures = self._batch_failures
         self.status.setText(f"批量完成：成功 {success}/{total}")
         if failures:
             detail = "\n".join(failures[:5])
@@ -201,6 +361,13 @@ class MainWindow(QMainWindow):
 
         QMessageBox.information(self, "批量转换完成", f"成功 {success}/{total}")
 
+    def closeEvent(self, event) -> None:
+        if self._batch_executor is not None:
+            self._batch_timer.stop()
+            self._batch_executor.shutdown(wait=False, cancel_futures=True)
+            self._batch_executor = None
+        super().closeEvent(event)
+
     def _set_batch_mode(self, enabled: bool) -> None:
         self._batch_mode = enabled
         self.output_edit.setEnabled(True)
@@ -214,7 +381,7 @@ class MainWindow(QMainWindow):
                 self.status.setText("")
 
     def set_startup_inputs(self, paths: list[str]) -> None:
-        cleaned = [Path(p).expanduser() for p in paths if p]
+        cleaned = [Path(p).expanduser().resolve() for p in paths if p]
         self._batch_inputs = cleaned
         if len(cleaned) <= 1:
             self._set_batch_mode(False)
@@ -232,10 +399,13 @@ def main(argv: list[str] | None = None) -> int:
     if argv is None:
         argv = sys.argv
 
+    use_cache = "--no-cache" not in argv[1:]
+    argv = [a for a in argv if a != "--no-cache"]
+
     app = QApplication(argv)
     app.setApplicationDisplayName("ImgConvert")
 
-    w = MainWindow()
+    w = MainWindow(use_cache=use_cache)
     w.resize(720, 220)
 
     if len(argv) > 1:
@@ -1,22 +1,36 @@
 from __future__ import annotations
 
 import base64
-from io import BytesIO
+import hashlib
 import mimetypes
 import os
 import re
+import shutil
+import stat
+import tempfile
+import threading
 import xml.etree.ElementTree as ET
 from dataclasses import dataclass
+from functools import lru_cache
 from pathlib import Path
-from typing import Optional, Tuple
+from typing import BinaryIO, Dict, Mapping, Optional, Tuple
 
 from PySide6.QtCore import QByteArray, QBuffer, QIODevice, QSize
 from PySide6.QtGui import QImage, QImageReader, QImageWriter, QColor, QPainter
 from PySide6.QtSvg import QSvgRenderer
 
+try:
+    from PIL import Image as _PIL_Image
+except ImportError:
+    _PIL_Image = None
 
-SUPPORTED_FORMATS = ("svg", "jpg", "png", "webp")
+
+# display order for the GUI; membership checks use the frozensets below
 SUPPORTED_FORMATS = ("svg", "jpg", "png", "webp", "ico")
+_SUPPORTED_SET = frozenset(SUPPORTED_FORMATS)
+_RASTER = frozenset({"jpg", "png", "webp", "ico"})
+_ICO_MAX_SIDE = 256
+_ICO_SIZES = [(16, 16), (24, 24), (32, 32), (48, 48), (64, 64), (128, 128), (256, 256)]
 
 
 @dataclass(frozen=True)
@@ -33,45 +47,53 @@ def _norm_ext(ext: str) -> str:
     return ext
 
 
-def detect_input_format(path: Path) -> Optional[str]:
-    ext = _norm_ext(path.suffix)
-    if ext in SUPPORTED_FORMATS:
+@lru_cache(maxsize=64)
+def _detect_from_suffix(suffix: str) -> Optional[str]:
+    ext = _norm_ext(suffix)
+    if ext in _SUPPORTED_SET:
         return ext
     return None
 
 
+def detect_input_format(path: Path) -> Optional[str]:
+    return _detect_from_suffix(path.suffix)
+
+
 def _read_bytes(path: Path) -> bytes:
     return path.read_bytes()
 
 
-def _svg_default_size(svg_bytes: bytes) -> Optional[Tuple[int, int]]:
-    """Best-effort: read width/height or viewBox from SVG."""
+_SVG_TAG_RE = re.compile(rb"<svg\b([^>]*)>", re.I)
+_SVG_ATTR_RE = re.compile(
+    rb"""(?<![\w:.-])(width|height|viewBox)\s*=\s*(?:"([^"]*)"|'([^']*)')""", re.I
+)
+_SVG_HEAD_BYTES = 4096
+_LEN_RE = re.compile(r"^\s*([0-9]*\.?[0-9]+)")
+_VB_SPLIT_RE = re.compile(r"[ ,]+")
+
+
+def _parse_len(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    # strip units: px, pt, etc. Keep only the leading number.
+    m = _LEN_RE.match(value)
+    if not m:
+        return None
     try:
-        # ElementTree can choke on some SVGs; keep it defensive.
-        root = ET.fromstring(svg_bytes)
+        return float(m.group(1))
     except Exception:
         return None
 
-    def _parse_len(value: Optional[str]) -> Optional[float]:
-        if not value:
-            return None
-        # strip units: px, pt, etc. Keep only the leading number.
-        m = re.match(r"^\s*([0-9]*\.?[0-9]+)", value)
-        if not m:
-            return None
-        try:
-            return float(m.group(1))
-        except Exception:
-            return None
 
-    w = _parse_len(root.get("width"))
-    h = _parse_len(root.get("height"))
+def _svg_size_from_attrs(attrs: Mapping[str, str]) -> Optional[Tuple[int, int]]:
+    w = _parse_len(attrs.get("width"))
+    h = _parse_len(attrs.get("height"))
     if w and h and w > 0 and h > 0:
         return int(round(w)), int(round(h))
 
-    view_box = root.get("viewBox") or root.get("viewbox")
+    view_box = attrs.get("viewBox") or attrs.get("viewbox")
     if view_box:
-        parts = re.split(r"[ ,]+", view_box.strip())
+        parts = _VB_SPLIT_RE.split(view_box.strip())
         if len(parts) == 4:
             try:
                 vb_w = float(parts[2])
@@ -84,7 +106,60 @@ def _svg_default_size(svg_bytes: bytes) -> Optional[Tuple[int, int]]:
     return None
 
 
-def _render_svg_to_image(svg_bytes: bytes) -> Tuple[Optional[QImage], str]:
+def _svg_root_attrs_fast(svg_bytes: bytes) -> Dict[str, str]:
+    """Pull width/height/viewBox off the root tag without building a DOM."""
+    m = _SVG_TAG_RE.search(svg_bytes, 0, _SVG_HEAD_BYTES)
+    # a match after a comment may be commented-out markup, not the real root
+    if not m or b"<!--" in svg_bytes[: m.start()]:
+        return {}
+    attrs: Dict[str, str] = {}
+    for name, dq, sq in _SVG_ATTR_RE.findall(m.group(1)):
+        key = name.decode("ascii").lower()
+        if key == "viewbox":
+            key = "viewBox"
+        attrs.setdefault(key, (dq or sq).decode("utf-8", "replace"))
+    return attrs
+
+
+def _svg_default_size(svg_bytes: bytes) -> Optional[Tuple[int, int]]:
+    """Best-effort: read width/height or viewBox from SVG."""
+    # the regex can misread a root tag with '>' inside a quoted value, so any
+    # miss falls back to a full parse
+    size = _svg_size_from_attrs(_svg_root_attrs_fast(svg_bytes))
+    if size:
+        return size
+
+    try:
+        # ElementTree can choke on some SVGs; keep it defensive.
+        root = ET.fromstring(svg_bytes)
+    except Exception:
+        return None
+    return _svg_size_from_attrs(root.attrib)
+
+
+# Per-thread render targets reused across a batch. Batch workers convert one
+# file at a time, and every caller is done with the image before the next
+# conversion on the same thread starts.
+_scratch = threading.local()
+_SCRATCH_MAX_PIXELS = 4096 * 4096
+
+
+def _scratch_image(slot: str, size: QSize, fmt: QImage.Format) -> QImage:
+    if size.width() * size.height() > _SCRATCH_MAX_PIXELS:
+        return QImage(size, fmt)
+    images: Optional[Dict[str, QImage]] = getattr(_scratch, "images", None)
+    if images is None:
+        images = _scratch.images = {}
+    image = images.get(slot)
+    if image is None or image.size() != size or image.format() != fmt:
+        image = QImage(size, fmt)
+        images[slot] = image
+    return image
+
+
+def _render_svg_to_image(
+    svg_bytes: bytes, bg_color: Optional[QColor] = None
+) -> Tuple[Optional[QImage], str]:
     renderer = QSvgRenderer(QByteArray(svg_bytes))
     if not renderer.isValid():
         return None, "SVG 文件无法解析/渲染"
@@ -98,8 +173,13 @@ def _render_svg_to_image(svg_bytes: bytes) -> Tuple[Optional[QImage], str]:
     if default_size.isEmpty():
         default_size = QSize(512, 512)
 
-    image = QImage(default_size, QImage.Format_ARGB32)
-    image.fill(QColor(0, 0, 0, 0))
+    if bg_color is not None:
+        # 目标不支持透明（JPG）：直接渲染到不透明底色上，省去写出时的二次合成
+        image = _scratch_image("svg_opaque", default_size, QImage.Format_RGB32)
+        image.fill(bg_color)
+    else:
+        image = _scratch_image("svg", default_size, QImage.Format_ARGB32)
+        image.fill(QColor(0, 0, 0, 0))
 
     painter = QPainter(image)
     try:
@@ -113,9 +193,21 @@ def _render_svg_to_image(svg_bytes: bytes) -> Tuple[Optional[QImage], str]:
     return image, ""
 
 
-def _read_raster(path: Path) -> Tuple[Optional[QImage], str]:
+def _read_raster(path: Path, max_side: Optional[int] = None) -> Tuple[Optional[QImage], str]:
     reader = QImageReader(str(path))
     reader.setAutoTransform(True)
+    if max_side:
+        # 输出很小（如 ICO）时让解码器直接按目标尺寸解码，JPEG 等可省掉大部分解码工作
+        size = reader.size()
+        longest = max(size.width(), size.height())
+        if size.isValid() and longest > max_side:
+            scale = max_side / longest
+            reader.setScaledSize(
+                QSize(
+                    max(1, round(size.width() * scale)),
+                    max(1, round(size.height() * scale)),
+                )
+            )
     image = reader.read()
     if image.isNull():
         err = reader.errorString() or "未知错误"
@@ -133,14 +225,7 @@ def _write_raster(image: QImage, out_path: Path, out_fmt: str) -> Tuple[bool, st
 
     # JPG 不支持透明：统一铺白底
     if out_fmt in ("jpg", "jpeg") and image.hasAlphaChannel():
-        composed = QImage(image.size(), QImage.Format_RGB32)
-        composed.fill(QColor("white"))
-        painter = QPainter(composed)
-        try:
-            painter.drawImage(0, 0, image)
-        finally:
-            painter.end()
-        image = composed
+        image = _flatten_on_white(image)
 
     ok = writer.write(image)
     if not ok:
@@ -149,15 +234,33 @@ def _write_raster(image: QImage, out_path: Path, out_fmt: str) -> Tuple[bool, st
     return True, ""
 
 
-def _write_ico(image: QImage, out_path: Path) -> Tuple[bool, str]:
+def _flatten_on_white(image: QImage) -> QImage:
+    composed = _scratch_image("flatten", image.size(), QImage.Format_RGB32)
+    composed.fill(QColor("white"))
+    painter = QPainter(composed)
     try:
-        from PIL import Image
-    except Exception:
+        painter.drawImage(0, 0, image)
+    finally:
+        painter.end()
+    return composed
+
+
+def _write_ico(image: QImage, out_path: Path) -> Tuple[bool, str]:
+    if _PIL_Image is None:
         return False, "写出 ICO 需要 Pillow：请安装 pip install Pillow"
 
-    png_bytes = _qimage_to_png_bytes(image)
+    # 直接把 RGBA8888 像素交给 Pillow，省去一次 PNG 编码+解码
+    rgba = image.convertToFormat(QImage.Format_RGBA8888)
     try:
-        src = Image.open(BytesIO(png_bytes)).convert("RGBA")
+        src = _PIL_Image.frombuffer(
+            "RGBA",
+            (rgba.width(), rgba.height()),
+            bytes(rgba.constBits()),
+            "raw",
+            "RGBA",
+            rgba.bytesPerLine(),
+            1,
+        )
     except Exception as exc:
         return False, f"ICO 编码失败：{exc}"
 
@@ -165,50 +268,209 @@ def _write_ico(image: QImage, out_path: Path) -> Tuple[bool, str]:
     if src_w <= 0 or src_h <= 0:
         return False, "ICO 编码失败：输入图像尺寸无效"
 
+    # ICO 最大 256：先一次性高质量缩到 256，各尺寸再从小图重采样
     side = max(src_w, src_h)
-    canvas = Image.new("RGBA", (side, side), (0, 0, 0, 0))
+    if side > _ICO_MAX_SIDE:
+        scale = _ICO_MAX_SIDE / side
+        src_w = max(1, round(src_w * scale))
+        src_h = max(1, round(src_h * scale))
+        src = src.resize((src_w, src_h), _PIL_Image.LANCZOS)
+        side = _ICO_MAX_SIDE
+
+    canvas = _PIL_Image.new("RGBA", (side, side), (0, 0, 0, 0))
     paste_x = (side - src_w) // 2
     paste_y = (side - src_h) // 2
     canvas.paste(src, (paste_x, paste_y), src)
 
-    sizes = [(16, 16), (24, 24), (32, 32), (48, 48), (64, 64), (128, 128), (256, 256)]
     try:
-        canvas.save(str(out_path), format="ICO", sizes=sizes)
+        canvas.save(str(out_path), format="ICO", sizes=_ICO_SIZES)
     except Exception as exc:
         return False, f"写出 ICO 失败：{exc}"
 
     return True, ""
 
 
+def _ico_has_sizes(path: Path) -> bool:
+    """True if the ICO at path already contains every size _write_ico would generate."""
+    if _PIL_Image is None:
+        return False
+    try:
+        with _PIL_Image.open(path) as im:
+            present = set(im.info.get("sizes") or ())
+    except Exception:
+        return False
+    return present.issuperset(_ICO_SIZES)
+
+
 def _qimage_to_png_bytes(image: QImage) -> bytes:
     ba = QByteArray()
     buf = QBuffer(ba)
     buf.open(QIODevice.WriteOnly)
+    # 这份 PNG 会写进输出 SVG（并进入缓存），保持默认压缩
     image.save(buf, "PNG")
     buf.close()
     return bytes(ba)
 
 
-def _raster_to_svg_embed(image: QImage) -> str:
-    png_bytes = _qimage_to_png_bytes(image)
-    b64 = base64.b64encode(png_bytes).decode("ascii")
+# multiple of 3 so each chunk encodes without '=' padding
+_B64_CHUNK = 3 * 64 * 1024
+
+
+def _write_b64(fh: BinaryIO, data: memoryview) -> None:
+    for start in range(0, len(data), _B64_CHUNK):
+        fh.write(base64.b64encode(data[start : start + _B64_CHUNK]))
+
+
+def _write_raster_as_svg(image: QImage, out_path: Path) -> Tuple[bool, str]:
+    png = memoryview(_qimage_to_png_bytes(image))
     w = max(1, image.width())
     h = max(1, image.height())
 
-    # use href with xlink fallback for older viewers
-    data_uri = f"data:image/png;base64,{b64}"
-    return (
+    # use href with xlink fallback for older viewers; the base64 payload is
+    # streamed to the file in chunks instead of being built as one string
+    header = (
         "<?xml version=\"1.0\" encoding=\"UTF-8\" standalone=\"no\"?>\n"
-        f"<svg xmlns=\"http://www.w3.org/2000/svg\" xmlns:xlink=\"http://www.w3.org/1999/xlink\" "
+        "<svg xmlns=\"http://www.w3.org/2000/svg\" xmlns:xlink=\"http://www.w3.org/1999/xlink\" "
         f"width=\"{w}\" height=\"{h}\" viewBox=\"0 0 {w} {h}\">\n"
-        f"  <image x=\"0\" y=\"0\" width=\"{w}\" height=\"{h}\" href=\"{data_uri}\" xlink:href=\"{data_uri}\"/>\n"
-        "</svg>\n"
+        f"  <image x=\"0\" y=\"0\" width=\"{w}\" height=\"{h}\" href=\"data:image/png;base64,"
     )
+    try:
+        with out_path.open("wb") as fh:
+            fh.write(header.encode("ascii"))
+            _write_b64(fh, png)
+            fh.write(b"\" xlink:href=\"data:image/png;base64,")
+            _write_b64(fh, png)
+            fh.write(b"\"/>\n</svg>\n")
+    except OSError as exc:
+        return False, f"写出失败：{exc}"
+    return True, ""
+
+
+_CACHE_MAX_ENTRIES = 256
+_CACHE_MAX_BYTES = 256 * 1024 * 1024
+# bump when encoder settings change so stale outputs are not served
+_CACHE_VERSION = 3
+
+
+def _default_cache_dir() -> Path:
+    # per-user location: a fixed name in the shared temp dir could be pre-created
+    # by another user and seeded with outputs for predictable keys
+    if os.name == "nt":
+        base = os.environ.get("LOCALAPPDATA") or tempfile.gettempdir()
+    else:
+        base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return Path(base) / "imgconvert"
+
+
+_CACHE_DIR = _default_cache_dir()
+
+
+def _cache_dir() -> Optional[Path]:
+    """Return the cache directory, or None if it is missing or not safely ours."""
+    try:
+        _CACHE_DIR.mkdir(mode=0o700, parents=True, exist_ok=True)
+        st = os.lstat(_CACHE_DIR)
+    except OSError:
+        return None
+    if not stat.S_ISDIR(st.st_mode):
+        return None
+    if hasattr(os, "getuid"):
+        if st.st_uid != os.getuid() or stat.S_IMODE(st.st_mode) & 0o077:
+            return None
+    return _CACHE_DIR
+
+
+def _cache_key(input_path: Path, output_format: str) -> str:
+    digest = hashlib.sha256()
+    with input_path.open("rb") as fh:
+        for chunk in iter(lambda: fh.read(1 << 20), b""):
+            digest.update(chunk)
+    return f"v{_CACHE_VERSION}-{digest.hexdigest()}.{output_format}"
+
+
+def _cache_fetch(key: str, output_path: Path) -> bool:
+    cache_dir = _cache_dir()
+    if cache_dir is None:
+        return False
+    entry = cache_dir / key
+    try:
+        shutil.copyfile(entry, output_path)
+        os.utime(entry)  # mark as recently used
+    except OSError:
+        return False
+    return True
+
+
+def _cache_store(key: str, output_path: Path) -> None:
+    cache_dir = _cache_dir()
+    if cache_dir is None:
+        return
+    try:
+        fd, tmp = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+    except OSError:
+        return
+    os.close(fd)
+    try:
+        # write under a temp name first so a concurrent reader never sees a partial entry
+        shutil.copyfile(output_path, tmp)
+        os.replace(tmp, cache_dir / key)
+    except OSError:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        return
+    _cache_prune(cache_dir)
+
+
+def _cache_prune(cache_dir: Path) -> None:
+    """Drop least recently used entries until both the count and size limits hold."""
+    try:
+        entries = []
+        for p in cache_dir.iterdir():
+            if p.suffix != ".tmp":
+                st = p.stat()
+                entries.append((st.st_mtime, st.st_size, p))
+    except OSError:
+        return
+
+    count = len(entries)
+    total = sum(size for _, size, _ in entries)
+    if count <= _CACHE_MAX_ENTRIES and total <= _CACHE_MAX_BYTES:
+        return
+
+    entries.sort(key=lambda e: e[0])
+    for _, size, p in entries:
+        if count <= _CACHE_MAX_ENTRIES and total <= _CACHE_MAX_BYTES:
+            break
+        try:
+            p.unlink()
+        except OSError:
+            continue
+        count -= 1
+        total -= size
 
 
-def convert_file(input_path: Path, output_path: Path, output_format: str) -> ConvertResult:
+def convert_file(
+    input_path: Path, output_path: Path, output_format: str, use_cache: bool = True
+) -> ConvertResult:
     input_path = input_path.expanduser().resolve()
     output_path = output_path.expanduser().resolve()
+    return _convert_file_fast(input_path, output_path, output_format, use_cache, make_parent=True)
+
+
+def _convert_file_fast(
+    input_path: Path,
+    output_path: Path,
+    output_format: str,
+    use_cache: bool = True,
+    make_parent: bool = False,
+) -> ConvertResult:
+    """convert_file for callers that already resolved both paths.
+
+    The output directory is only created when make_parent is set; batch callers
+    create it once up front.
+    """
     output_format = _norm_ext(output_format)
 
     if not input_path.exists():
@@ -218,22 +480,48 @@ def convert_file(input_path: Path, output_path: Path, output_format: str) -> Con
     if not in_fmt:
         return ConvertResult(False, f"不支持的输入格式：{input_path.suffix}")
 
-    if output_format not in SUPPORTED_FORMATS:
+    if output_format not in _SUPPORTED_SET:
         return ConvertResult(False, f"不支持的输出格式：{output_format}")
 
     if input_path == output_path:
         return ConvertResult(False, "输出路径不能与输入路径相同")
 
-    output_path.parent.mkdir(parents=True, exist_ok=True)
+    if make_parent:
+        output_path.parent.mkdir(parents=True, exist_ok=True)
 
     # SVG -> SVG: direct copy
     if in_fmt == "svg" and output_format == "svg":
-        output_path.write_bytes(_read_bytes(input_path))
+        shutil.copyfile(input_path, output_path)
         return ConvertResult(True, "转换完成", output_path)
 
+    # Raster -> same raster format: nothing to re-encode. ICO is only copied when
+    # it already holds the full size ladder; otherwise it is rebuilt below.
+    if in_fmt == output_format and (in_fmt != "ico" or _ico_has_sizes(input_path)):
+        shutil.copyfile(input_path, output_path)
+        return ConvertResult(True, "转换完成（同格式直接复制）", output_path)
+
+    cache_key = None
+    if use_cache:
+        try:
+            cache_key = _cache_key(input_path, output_format)
+        except OSError:
+            cache_key = None
+    if cache_key and _cache_fetch(cache_key, output_path):
+        return ConvertResult(True, "转换完成（使用缓存）", output_path)
+
+    result = _convert_uncached(input_path, output_path, in_fmt, output_format)
+    if result.ok and cache_key:
+        _cache_store(cache_key, output_path)
+    return result
+
+
+def _convert_uncached(
+    input_path: Path, output_path: Path, in_fmt: str, output_format: str
+) -> ConvertResult:
     # Raster -> Raster
-    if in_fmt in ("jpg", "png", "webp", "ico") and output_format in ("jpg", "png", "webp", "ico"):
-        image, err = _read_raster(input_path)
+    if in_fmt in _RASTER and output_format in _RASTER:
+        max_side = _ICO_MAX_SIDE if output_format == "ico" else None
+        image, err = _read_raster(input_path, max_side)
         if not image:
             return ConvertResult(False, err)
         ok, werr = _write_raster(image, output_path, output_format)
@@ -242,9 +530,10 @@ def convert_file(input_path: Path, output_path: Path, output_format: str) -> Con
         return ConvertResult(True, "转换完成", output_path)
 
     # SVG -> Raster
-    if in_fmt == "svg" and output_format in ("jpg", "png", "webp", "ico"):
+    if in_fmt == "svg" and output_format in _RASTER:
         svg_bytes = _read_bytes(input_path)
-        image, err = _render_svg_to_image(svg_bytes)
+        bg_color = QColor("white") if output_format == "jpg" else None
+        image, err = _render_svg_to_image(svg_bytes, bg_color)
         if not image:
             return ConvertResult(False, err)
         ok, werr = _write_raster(image, output_path, output_format)
@@ -253,12 +542,13 @@ def convert_file(input_path: Path, output_path: Path, output_format: str) -> Con
         return ConvertResult(True, "转换完成", output_path)
 
     # Raster -> SVG (embed)
-    if in_fmt in ("jpg", "png", "webp", "ico") and output_format == "svg":
+    if in_fmt in _RASTER and output_format == "svg":
         image, err = _read_raster(input_path)
         if not image:
             return ConvertResult(False, err)
-        svg_text = _raster_to_svg_embed(image)
-        output_path.write_text(svg_text, encoding="utf-8")
+        ok, werr = _write_raster_as_svg(image, output_path)
+        if not ok:
+            return ConvertResult(False, werr)
         return ConvertResult(True, "转换完成（位图已嵌入 SVG，不做矢量化）", output_path)
 
     # Should not reach